@@ -1,8 +1,22 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from services.epub_service import process_full_epub
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from services.epub_service import (
+    process_full_epub,
+    iter_full_epub,
+    get_cached_book,
+    get_image_mime_type,
+)
+from typing import BinaryIO, Optional
+import orjson
+
+# orjson serializes the multi-megabyte html_content much faster than json
+app = FastAPI(title="Bionic EPUB Reader API", version="2.0.0", default_response_class=ORJSONResponse)
 
-app = FastAPI(title="Bionic EPUB Reader API", version="2.0.0")
+# Maximum EPUB upload size (100MB) and the chunk size uploads are read in
+MAX_UPLOAD_SIZE = 100 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 1024 * 1024
 
 # Configure CORS
 app.add_middleware(
@@ -17,28 +31,57 @@ app.add_middleware(
 async def health_check():
     return {"status": "healthy"}
 
-@app.post("/api/upload-epub")
-async def upload_epub(file: UploadFile = File(...)):
+async def read_epub_upload(file: UploadFile) -> BinaryIO:
     """
-    Upload an EPUB file and get the complete book as a single HTML document.
+    Validate an uploaded EPUB and return the spooled file holding it.
+    The upload is handed to the parser as a file, never copied into memory whole.
     """
     # Validate file type
     if not file.filename.lower().endswith('.epub'):
         raise HTTPException(status_code=400, detail="Only EPUB files are allowed")
     
-    # Read file content
-    content = await file.read()
+    # Check file size (100MB limit) up front when known, and otherwise by
+    # reading through the upload in chunks
+    size = file.size
+    if size is None:
+        size = 0
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_UPLOAD_SIZE:
+                break
     
-    # Check file size (100MB limit)
-    if len(content) > 100 * 1024 * 1024:
+    if size > MAX_UPLOAD_SIZE:
         raise HTTPException(status_code=413, detail="File too large. Maximum size is 100MB")
     
+    await file.seek(0)
+    return file.file
+
+def image_url_prefix(request: Request, inline_images: bool) -> Optional[str]:
+    """
+    Get the URL prefix images should be linked under, or None to inline them.
+    """
+    if inline_images:
+        return None
+    return str(request.base_url).rstrip('/') + "/api/image"
+
+@app.post("/api/upload-epub")
+async def upload_epub(request: Request, file: UploadFile = File(...), inline_images: bool = True):
+    """
+    Upload an EPUB file and get the complete book as a single HTML document.
+    With inline_images=false (experimental), images are linked to /api/image
+    instead of being embedded as base64; see get_image for its limits.
+    """
+    content = await read_epub_upload(file)
+    
     try:
-        # Process the entire EPUB and return as single HTML
-        book_data = process_full_epub(content)
+        # Process the entire EPUB and return as single HTML, off the event loop
+        book_data = await run_in_threadpool(
+            process_full_epub, content, image_url_prefix(request, inline_images)
+        )
         
         return {
             "filename": file.filename,
+            "book_id": book_data["book_id"],
             "title": book_data["title"],
             "author": book_data["author"],
             "html_content": book_data["html_content"]
@@ -46,6 +89,52 @@ async def upload_epub(file: UploadFile = File(...)):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"EPUB processing failed: {str(e)}")
 
+@app.post("/api/upload-epub/stream")
+async def upload_epub_stream(request: Request, file: UploadFile = File(...), inline_images: bool = True):
+    """
+    Upload an EPUB file and stream the book back as NDJSON: one metadata line,
+    then one line per chapter, so only one chapter's HTML is held at a time.
+    """
+    content = await read_epub_upload(file)
+    events = iter_full_epub(content, image_url_prefix(request, inline_images))
+    
+    try:
+        # Parse the book up front so failures still get a proper error status
+        meta = await run_in_threadpool(next, events)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"EPUB processing failed: {str(e)}")
+    
+    def ndjson_lines():
+        yield orjson.dumps({**meta, "filename": file.filename}) + b"\n"
+        for event in events:
+            yield orjson.dumps(event) + b"\n"
+    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+@app.get("/api/image/{book_id}/{name:path}")
+async def get_image(book_id: str, name: str):
+    """
+    Serve an image from a recently uploaded book.
+    
+    Experimental: images are served from the in-process parsed-book cache, so
+    a link only works on the worker that processed the upload, and only until
+    the book is evicted or the server restarts. Deployments with several
+    workers should keep the default inline_images=true.
+    """
+    pb = get_cached_book(book_id)
+    image_item = pb.images_by_name.get(name) if pb else None
+    if image_item is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    
+    # A given URL always names the same bytes (the book ID is a content hash),
+    # so the browser may reuse a response it has; it just can't count on the
+    # server still having the book later
+    return Response(
+        content=image_item.get_content(),
+        media_type=get_image_mime_type(name),
+        headers={"Cache-Control": "private, max-age=86400"},
+    )
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
@@ -1,111 +1,364 @@
 import ebooklib
 from ebooklib import epub
-from bs4 import BeautifulSoup
-from typing import Dict
-import tempfile
-import os
+import lxml.etree
+import lxml.html
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import BinaryIO, Dict, Iterator, List, Optional, Union
 import base64
+import hashlib
+import io
+import os
+import posixpath
+import threading
+import urllib.parse
+import zipfile
+
+# Total content size of the parsed books kept in memory for repeat requests.
+# Books larger than this are never cached; 0 disables the cache.
+BOOK_CACHE_MAX_BYTES = int(os.environ.get('BOOK_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+
+# Chunk size used when hashing EPUBs read from a file
+HASH_CHUNK_SIZE = 1024 * 1024
 
-def process_full_epub(epub_bytes: bytes) -> Dict:
+# An EPUB given either as its content or as a seekable binary file
+EpubSource = Union[bytes, BinaryIO]
+
+# Image mime types by file extension (anything else is treated as JPEG)
+IMAGE_MIME_TYPES = {
+    '.png': 'image/png',
+    '.gif': 'image/gif',
+    '.svg': 'image/svg+xml',
+    '.webp': 'image/webp',
+}
+
+
+@dataclass
+class ParsedBook:
     """
-    Process an entire EPUB file and return all content as a single HTML document.
-    
-    Returns:
-        Dictionary with metadata and complete book HTML
+    A parsed EPUB together with the lookup tables built from it.
     """
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.epub') as tmp_file:
-        tmp_file.write(epub_bytes)
-        tmp_path = tmp_file.name
+    book_id: str
+    book: epub.EpubBook
+    # Total size of the item content held in memory, in bytes
+    size: int
+    documents: List[epub.EpubItem]
+    images_by_name: Dict[str, epub.EpubItem]
+    images_by_basename: Dict[str, epub.EpubItem]
+
+
+# lxml serializes threads sharing one parser, so each threadpool worker
+# gets its own
+_thread_local = threading.local()
+
+_book_cache: 'OrderedDict[bytes, ParsedBook]' = OrderedDict()
+_book_cache_bytes = 0
+_book_cache_lock = threading.Lock()
+
+
+def _html_parser() -> lxml.html.HTMLParser:
+    """
+    Get this thread's HTML parser. EPUB documents are XHTML and almost always UTF-8.
+    """
+    parser = getattr(_thread_local, 'html_parser', None)
+    if parser is None:
+        parser = _thread_local.html_parser = lxml.html.HTMLParser(encoding='utf-8')
     
-    try:
-        book = epub.read_epub(tmp_path)
+    return parser
+
+
+class _StreamEpubReader(epub.EpubReader):
+    """
+    EpubReader that opens the archive from a file-like object instead of a path.
+    """
+    def _load(self):
+        try:
+            self.zf = zipfile.ZipFile(self.file_name, 'r', compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        except zipfile.BadZipfile:
+            raise epub.EpubException(0, 'Bad Zip file')
+        except zipfile.LargeZipFile:
+            raise epub.EpubException(1, 'Large Zip file')
         
-        # Get metadata
-        title = book.get_metadata('DC', 'title')
-        title = title[0][0] if title else 'Unknown'
+        self._load_container()
+        self._load_opf_file()
         
-        author = book.get_metadata('DC', 'creator')
-        author = author[0][0] if author else 'Unknown'
+        self.zf.close()
+
+
+def read_epub_from_bytes(epub_bytes: bytes) -> epub.EpubBook:
+    """
+    Parse an EPUB held in memory without writing it to a temporary file.
+    """
+    return read_epub_from_file(io.BytesIO(epub_bytes))
+
+
+def read_epub_from_file(epub_file: BinaryIO) -> epub.EpubBook:
+    """
+    Parse an EPUB from a seekable binary file. The archive is read in place,
+    so the file's content never has to be copied into a bytes object.
+    """
+    epub_file.seek(0)
+    reader = _StreamEpubReader(epub_file)
+    book = reader.load()
+    reader.process()
+    
+    return book
+
+
+def _book_key(source: EpubSource) -> bytes:
+    """
+    Get the cache key for an EPUB: a BLAKE2 digest of its content.
+    """
+    if isinstance(source, bytes):
+        return hashlib.blake2b(source, digest_size=16).digest()
+    
+    digest = hashlib.blake2b(digest_size=16)
+    source.seek(0)
+    while chunk := source.read(HASH_CHUNK_SIZE):
+        digest.update(chunk)
+    
+    return digest.digest()
+
+
+def _load_book(source: EpubSource) -> ParsedBook:
+    """
+    Parse an EPUB, reusing a cached parse when the same content was seen recently.
+    The cache is keyed by a BLAKE2 digest of the file content.
+    """
+    key = _book_key(source)
+    
+    with _book_cache_lock:
+        parsed = _book_cache.get(key)
+        if parsed is not None:
+            _book_cache.move_to_end(key)
+            return parsed
+    
+    if isinstance(source, bytes):
+        book = read_epub_from_bytes(source)
+    else:
+        book = read_epub_from_file(source)
+    items = list(book.get_items())
+    images_by_name = {
+        item.get_name(): item for item in items if item.get_type() == ebooklib.ITEM_IMAGE
+    }
+    # First image wins when several share a file name, as with a linear scan
+    images_by_basename = {}
+    for name, item in images_by_name.items():
+        images_by_basename.setdefault(name.rsplit('/', 1)[-1], item)
+    
+    parsed = ParsedBook(
+        book_id=key.hex(),
+        book=book,
+        size=sum(len(item.content or b'') for item in items),
+        documents=[item for item in items if item.get_type() == ebooklib.ITEM_DOCUMENT],
+        images_by_name=images_by_name,
+        images_by_basename=images_by_basename,
+    )
+    
+    _cache_book(key, parsed)
+    
+    return parsed
+
+
+def _cache_book(key: bytes, parsed: ParsedBook):
+    """
+    Keep a parsed book for repeat requests, evicting the least recently used
+    books until the cache fits in BOOK_CACHE_MAX_BYTES.
+    """
+    global _book_cache_bytes
+    
+    if parsed.size > BOOK_CACHE_MAX_BYTES:
+        return
+    
+    with _book_cache_lock:
+        if key in _book_cache:
+            return
         
-        # Combine all chapters into one HTML document
-        all_html_parts = []
+        _book_cache[key] = parsed
+        _book_cache_bytes += parsed.size
         
-        # Get all document items
-        documents = [item for item in book.get_items() if item.get_type() == ebooklib.ITEM_DOCUMENT]
+        while _book_cache_bytes > BOOK_CACHE_MAX_BYTES:
+            _, evicted = _book_cache.popitem(last=False)
+            _book_cache_bytes -= evicted.size
+
+
+def get_cached_book(book_id: str) -> Optional[ParsedBook]:
+    """
+    Look up a recently processed book by its ID, without parsing anything.
+    """
+    try:
+        key = bytes.fromhex(book_id)
+    except ValueError:
+        return None
+    
+    with _book_cache_lock:
+        return _book_cache.get(key)
+
+
+def process_full_epub(epub_file: EpubSource, image_url_prefix: Optional[str] = None) -> Dict:
+    """
+    Process an entire EPUB file and return all content as a single HTML document.
+    
+    Args:
+        epub_file: The EPUB content, or a seekable binary file holding it
+        image_url_prefix: If given, images are linked under this URL instead
+            of being inlined as base64 data URLs, as long as the book fits in
+            the cache the image endpoint serves from
+    
+    Returns:
+        Dictionary with book ID, metadata and complete book HTML
+    """
+    pb = _load_book(epub_file)
+    
+    # Combine all chapters into one HTML document
+    complete_html = '\n'.join(iter_chapter_html(pb, image_url_prefix))
+    
+    return {
+        'book_id': pb.book_id,
+        **get_book_metadata(pb),
+        'html_content': complete_html
+    }
+
+
+def iter_full_epub(epub_file: EpubSource, image_url_prefix: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Process an EPUB file lazily, one chapter at a time.
+    
+    Yields:
+        A {'type': 'meta', 'book_id', 'title', 'author'} event, then one
+        {'type': 'chapter', 'html'} event per chapter in reading order
+    """
+    pb = _load_book(epub_file)
+    
+    yield {'type': 'meta', 'book_id': pb.book_id, **get_book_metadata(pb)}
+    
+    for chapter_html in iter_chapter_html(pb, image_url_prefix):
+        yield {'type': 'chapter', 'html': chapter_html}
+
+
+def get_book_metadata(pb: ParsedBook) -> Dict:
+    """
+    Get the title and author of a parsed book.
+    """
+    title = pb.book.get_metadata('DC', 'title')
+    title = title[0][0] if title else 'Unknown'
+    
+    author = pb.book.get_metadata('DC', 'creator')
+    author = author[0][0] if author else 'Unknown'
+    
+    return {
+        'title': title,
+        'author': author
+    }
+
+
+def iter_chapter_html(pb: ParsedBook, image_url_prefix: Optional[str] = None) -> Iterator[str]:
+    """
+    Yield the HTML of each document in the book, wrapped in a chapter-content div.
+    """
+    # Data URLs by image name, shared across chapters for this pass only so
+    # encoded copies don't outlive the request
+    data_urls: Dict[str, str] = {}
+    
+    # Image links only resolve while the book is cached, so inline the images
+    # of books that were too large to cache
+    if image_url_prefix is not None and get_cached_book(pb.book_id) is not pb:
+        image_url_prefix = None
+    
+    for item in pb.documents:
+        try:
+            tree = lxml.html.document_fromstring(item.get_content(), parser=_html_parser())
+        except lxml.etree.ParserError:
+            # Empty document
+            continue
         
-        for item in documents:
-            content = item.get_content().decode('utf-8')
-            soup = BeautifulSoup(content, 'lxml')
-            
-            # Convert images to base64
-            convert_images_to_base64(soup, book)
-            
-            # Get the body content
-            body = soup.find('body')
-            if body:
-                # Add a chapter separator div
-                chapter_div = soup.new_tag('div', **{'class': 'chapter-content'})
-                for child in list(body.children):
-                    chapter_div.append(child)
-                all_html_parts.append(str(chapter_div))
-            else:
-                all_html_parts.append(str(soup))
+        # Point images at the image endpoint, or inline them as base64
+        if image_url_prefix is not None:
+            link_images(tree, pb, item.get_name(), image_url_prefix)
+        else:
+            convert_images_to_base64(tree, pb, item.get_name(), data_urls)
         
-        # Combine all parts into one HTML
-        complete_html = '\n'.join(all_html_parts)
+        # Get the body content
+        body = tree.find('body')
+        if body is not None:
+            # Turn the body into the chapter separator div
+            body.tag = 'div'
+            body.attrib.clear()
+            body.set('class', 'chapter-content')
+            yield lxml.html.tostring(body, encoding='unicode', with_tail=False)
+        else:
+            yield lxml.html.tostring(tree, encoding='unicode')
+
+
+def find_image(pb: ParsedBook, src: str, document_name: str) -> Optional[epub.EpubItem]:
+    """
+    Find the image item an <img> src refers to. The src is resolved against the
+    directory of the document referencing it, falling back to a loose match by
+    path and then by file name for books with sloppy links.
+    """
+    path = urllib.parse.unquote(src)
+    resolved = posixpath.normpath(posixpath.join(posixpath.dirname(document_name), path))
+    image_item = pb.images_by_name.get(resolved)
+    if image_item:
+        return image_item
+    
+    # Clean up the src path
+    path = path.lstrip('/').replace('../', '')
+    
+    return pb.images_by_name.get(path) or pb.images_by_basename.get(path.rsplit('/', 1)[-1])
+
+
+def get_image_mime_type(item_name: str) -> str:
+    """
+    Determine an image's mime type from its file extension.
+    """
+    extension = os.path.splitext(item_name)[1].lower()
+    return IMAGE_MIME_TYPES.get(extension, 'image/jpeg')
+
+
+def link_images(tree: lxml.html.HtmlElement, pb: ParsedBook, document_name: str, image_url_prefix: str):
+    """
+    Rewrite all image tags in the HTML to point at the image endpoint.
+    The browser can then fetch and cache images separately from the HTML.
+    """
+    book_prefix = f"{image_url_prefix}/{pb.book_id}/"
+    
+    for img_tag in tree.iter('img'):
+        src = img_tag.get('src')
+        if not src:
+            continue
         
-        return {
-            'title': title,
-            'author': author,
-            'html_content': complete_html
-        }
-    finally:
-        if os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+        image_item = find_image(pb, src, document_name)
+        if image_item:
+            img_tag.set('src', book_prefix + urllib.parse.quote(image_item.get_name()))
 
 
-def convert_images_to_base64(soup: BeautifulSoup, book: epub.EpubBook):
+def convert_images_to_base64(
+    tree: lxml.html.HtmlElement, pb: ParsedBook, document_name: str, data_urls: Dict[str, str]
+):
     """
     Convert all image tags in the HTML to base64 data URLs.
     This allows images to display without needing separate image serving endpoints.
+    data_urls memoizes the encoded images by name across calls.
     """
-    for img_tag in soup.find_all('img'):
+    for img_tag in tree.iter('img'):
         src = img_tag.get('src')
         if not src:
             continue
         
-        # Clean up the src path
-        src = src.lstrip('/').replace('../', '')
+        image_item = find_image(pb, src, document_name)
+        if not image_item:
+            continue
         
-        # Find the image in the EPUB
-        image_item = None
-        for item in book.get_items():
-            if item.get_type() == ebooklib.ITEM_IMAGE:
-                item_name = item.get_name()
-                if src in item_name or item_name.endswith(src.split('/')[-1]):
-                    image_item = item
-                    break
+        item_name = image_item.get_name()
+        data_url = data_urls.get(item_name)
         
-        if image_item:
-            try:
-                image_content = image_item.get_content()
-                
-                # Determine mime type
-                mime_type = 'image/jpeg'
-                if item_name.lower().endswith('.png'):
-                    mime_type = 'image/png'
-                elif item_name.lower().endswith('.gif'):
-                    mime_type = 'image/gif'
-                elif item_name.lower().endswith('.svg'):
-                    mime_type = 'image/svg+xml'
-                elif item_name.lower().endswith('.webp'):
-                    mime_type = 'image/webp'
-                
-                # Convert to base64
-                base64_data = base64.b64encode(image_content).decode('utf-8')
-                data_url = f"data:{mime_type};base64,{base64_data}"
-                
-                img_tag['src'] = data_url
-                
-            except Exception as e:
-                print(f"Failed to convert image {src}: {e}")
\ No newline at end of file
+        if data_url is None:
+            mime_type = get_image_mime_type(item_name)
+            
+            # Convert to base64 once per image, however often it is referenced
+            base64_data = base64.b64encode(image_item.get_content()).decode('ascii')
+            data_url = ''.join(('data:', mime_type, ';base64,', base64_data))
+            data_urls[item_name] = data_url
+        
+        img_tag.set('src', data_url)
@@ -0,0 +1,58 @@
+import os
+import sys
+
+import pytest
+from ebooklib import epub
+from fastapi.testclient import TestClient
+
+# Make the backend's top-level modules (main, services) importable
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import app  # noqa: E402
+
+# A valid 1x1 PNG
+PNG_BYTES = bytes.fromhex(
+    '89504e470d0a1a0a0000000d4948445200000001000000010802000000907753de'
+    '0000000c49444154789c63f8cfc0000003010100c9fe92ef0000000049454e44ae426082'
+)
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def make_epub(tmp_path):
+    """
+    Build a small EPUB with ebooklib and return its bytes.
+    
+    chapters maps document file names to body HTML; images maps image file
+    names to their content.
+    """
+    def build(chapters, images=None, title='Test Book', author='Test Author'):
+        book = epub.EpubBook()
+        book.set_identifier('test-book')
+        book.set_title(title)
+        book.add_author(author)
+        book.set_language('en')
+        
+        for name, content in (images or {}).items():
+            book.add_item(epub.EpubItem(file_name=name, media_type='image/png', content=content))
+        
+        documents = []
+        for i, (name, body) in enumerate(chapters.items()):
+            chapter = epub.EpubHtml(title=f'Chapter {i}', file_name=name, lang='en')
+            chapter.content = body
+            book.add_item(chapter)
+            documents.append(chapter)
+        
+        book.toc = documents
+        book.spine = documents
+        book.add_item(epub.EpubNcx())
+        
+        path = tmp_path / 'book.epub'
+        epub.write_epub(str(path), book)
+        return path.read_bytes()
+    
+    return build
@@ -0,0 +1,47 @@
+from collections import OrderedDict
+
+import pytest
+
+from services import epub_service
+
+
+@pytest.fixture
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(epub_service, '_book_cache', OrderedDict())
+    monkeypatch.setattr(epub_service, '_book_cache_bytes', 0)
+    return epub_service._book_cache
+
+
+def test_repeat_parse_is_served_from_cache(make_epub, empty_cache):
+    content = make_epub({'text/ch1.xhtml': '<p>Text</p>'})
+    
+    first = epub_service._load_book(content)
+    
+    assert epub_service._load_book(content) is first
+    assert epub_service._book_cache_bytes == first.size
+
+
+def test_book_over_budget_is_not_cached(make_epub, empty_cache, monkeypatch):
+    content = make_epub({'text/ch1.xhtml': '<p>Text</p>'})
+    monkeypatch.setattr(epub_service, 'BOOK_CACHE_MAX_BYTES', 1)
+    
+    pb = epub_service._load_book(content)
+    
+    assert epub_service.get_cached_book(pb.book_id) is None
+    assert epub_service._book_cache_bytes == 0
+
+
+def test_least_recently_used_book_is_evicted(make_epub, empty_cache, monkeypatch):
+    books = [make_epub({'text/ch1.xhtml': f'<p>Book {i}</p>'}, title=f'Book {i}') for i in range(3)]
+    size = epub_service._load_book(books[0]).size
+    monkeypatch.setattr(epub_service, 'BOOK_CACHE_MAX_BYTES', 2 * size + size // 2)
+    
+    first = epub_service._load_book(books[0])
+    second = epub_service._load_book(books[1])
+    epub_service._load_book(books[0])
+    third = epub_service._load_book(books[2])
+    
+    assert epub_service.get_cached_book(first.book_id) is first
+    assert epub_service.get_cached_book(second.book_id) is None
+    assert epub_service.get_cached_book(third.book_id) is third
+    assert epub_service._book_cache_bytes <= epub_service.BOOK_CACHE_MAX_BYTES
@@ -0,0 +1,48 @@
+import re
+
+from services import epub_service
+
+from conftest import PNG_BYTES
+
+
+def upload(client, content):
+    response = client.post(
+        '/api/upload-epub', params={'inline_images': 'false'}, files={'file': ('book.epub', content)}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_linked_image_is_served(client, make_epub):
+    content = make_epub(
+        {'text/ch1.xhtml': '<img src="../images/cover.png"/>'},
+        images={'images/cover.png': PNG_BYTES},
+    )
+    
+    data = upload(client, content)
+    
+    src = re.search(r'src="([^"]+)"', data['html_content']).group(1)
+    assert src == f"http://testserver/api/image/{data['book_id']}/images/cover.png"
+    
+    response = client.get(src)
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'image/png'
+    assert response.content == PNG_BYTES
+
+
+def test_uncacheable_book_falls_back_to_inline_images(client, make_epub, monkeypatch):
+    content = make_epub(
+        {'text/ch1.xhtml': '<img src="../images/cover.png"/>'},
+        images={'images/cover.png': PNG_BYTES},
+        title='Too Large To Cache',
+    )
+    monkeypatch.setattr(epub_service, 'BOOK_CACHE_MAX_BYTES', 0)
+    
+    data = upload(client, content)
+    
+    assert 'src="data:image/png;base64,' in data['html_content']
+
+
+def test_unknown_image_is_not_found(client):
+    assert client.get('/api/image/not-hex/images/cover.png').status_code == 404
+    assert client.get('/api/image/00ff/images/cover.png').status_code == 404
@@ -0,0 +1,60 @@
+import base64
+
+from services.epub_service import process_full_epub
+
+from conftest import PNG_BYTES
+
+OTHER_IMAGE = b'\x89PNG other image'
+
+
+def data_url(content):
+    return f'data:image/png;base64,{base64.b64encode(content).decode()}'
+
+
+def test_src_resolves_relative_to_document(make_epub):
+    content = make_epub(
+        {'text/ch1.xhtml': '<img src="../images/sub/cover.png"/>'},
+        images={'images/cover.png': PNG_BYTES, 'images/sub/cover.png': OTHER_IMAGE},
+    )
+    
+    html = process_full_epub(content)['html_content']
+    
+    assert data_url(OTHER_IMAGE) in html
+    assert data_url(PNG_BYTES) not in html
+
+
+def test_shared_file_name_falls_back_to_first_image(make_epub):
+    content = make_epub(
+        {'ch1.xhtml': '<img src="cover.png"/>'},
+        images={'images/cover.png': PNG_BYTES, 'images/sub/cover.png': OTHER_IMAGE},
+    )
+    
+    html = process_full_epub(content)['html_content']
+    
+    assert data_url(PNG_BYTES) in html
+    assert data_url(OTHER_IMAGE) not in html
+
+
+def test_unknown_image_keeps_src(make_epub):
+    content = make_epub(
+        {'text/ch1.xhtml': '<img src="../images/missing.png"/>'},
+        images={'images/cover.png': PNG_BYTES},
+    )
+    
+    html = process_full_epub(content)['html_content']
+    
+    assert 'src="../images/missing.png"' in html
+
+
+def test_image_shared_by_chapters_is_inlined_everywhere(make_epub):
+    content = make_epub(
+        {
+            'text/ch1.xhtml': '<img src="../images/cover.png"/>',
+            'text/ch2.xhtml': '<img src="../images/cover.png"/>',
+        },
+        images={'images/cover.png': PNG_BYTES},
+    )
+    
+    html = process_full_epub(content)['html_content']
+    
+    assert html.count(data_url(PNG_BYTES)) == 2
@@ -0,0 +1,67 @@
+import base64
+import io
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+from services.epub_service import process_full_epub
+
+from conftest import PNG_BYTES
+
+
+def test_upload_round_trip(client, make_epub):
+    content = make_epub(
+        {
+            'text/ch1.xhtml': '<h1>One</h1><p>Fish &amp; chips</p><img src="../images/cover.png"/>',
+            'text/ch2.xhtml': '<h1>Two</h1><p>Café</p>',
+        },
+        images={'images/cover.png': PNG_BYTES},
+    )
+    
+    response = client.post('/api/upload-epub', files={'file': ('book.epub', content)})
+    
+    assert response.status_code == 200
+    data = response.json()
+    assert data['filename'] == 'book.epub'
+    assert data['title'] == 'Test Book'
+    assert data['author'] == 'Test Author'
+    
+    html = data['html_content']
+    assert html.count('<div class="chapter-content">') == 2
+    assert html.index('<h1>One</h1>') < html.index('<h1>Two</h1>')
+    assert 'Fish &amp; chips' in html
+    assert 'Café' in html
+    assert f'src="data:image/png;base64,{base64.b64encode(PNG_BYTES).decode()}"' in html
+
+
+def test_upload_rejects_non_epub(client):
+    response = client.post('/api/upload-epub', files={'file': ('book.pdf', b'%PDF')})
+    
+    assert response.status_code == 400
+
+
+def test_upload_rejects_oversized_file(client, make_epub, monkeypatch):
+    content = make_epub({'text/ch1.xhtml': '<p>Text</p>'})
+    monkeypatch.setattr(main, 'MAX_UPLOAD_SIZE', len(content) - 1)
+    
+    response = client.post('/api/upload-epub', files={'file': ('book.epub', content)})
+    
+    assert response.status_code == 413
+
+
+def test_bytes_and_file_sources_agree(make_epub):
+    content = make_epub({'text/ch1.xhtml': '<p>Text</p>'})
+    
+    from_bytes = process_full_epub(content)
+    from_file = process_full_epub(io.BytesIO(content))
+    
+    assert from_bytes == from_file
+
+
+def test_concurrent_processing_matches_serial(make_epub):
+    books = [make_epub({f'text/ch{j}.xhtml': f'<p>Book {i} chapter {j}</p>' for j in range(5)}) for i in range(4)]
+    serial = [process_full_epub(book) for book in books]
+    
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        concurrent = list(executor.map(process_full_epub, books))
+    
+    assert concurrent == serial
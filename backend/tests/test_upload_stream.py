@@ -0,0 +1,45 @@
+import orjson
+
+
+def test_stream_yields_meta_then_chapters(client, make_epub):
+    content = make_epub({
+        'text/ch1.xhtml': '<h1>One</h1><p>First chapter</p>',
+        'text/ch2.xhtml': '<h1>Two</h1><p>Second chapter</p>',
+    })
+    
+    response = client.post('/api/upload-epub/stream', files={'file': ('book.epub', content)})
+    
+    assert response.status_code == 200
+    assert response.headers['content-type'] == 'application/x-ndjson'
+    
+    meta, *chapters = [orjson.loads(line) for line in response.content.splitlines()]
+    assert meta['type'] == 'meta'
+    assert meta['title'] == 'Test Book'
+    assert meta['author'] == 'Test Author'
+    assert meta['filename'] == 'book.epub'
+    assert meta['book_id']
+    
+    assert [chapter['type'] for chapter in chapters] == ['chapter', 'chapter']
+    assert 'First chapter' in chapters[0]['html']
+    assert 'Second chapter' in chapters[1]['html']
+    assert all(chapter['html'].startswith('<div class="chapter-content">') for chapter in chapters)
+
+
+def test_stream_matches_full_upload(client, make_epub):
+    content = make_epub({
+        'text/ch1.xhtml': '<p>First chapter</p>',
+        'text/ch2.xhtml': '<p>Second chapter</p>',
+    })
+    
+    streamed = client.post('/api/upload-epub/stream', files={'file': ('book.epub', content)})
+    full = client.post('/api/upload-epub', files={'file': ('book.epub', content)})
+    
+    chapters = [orjson.loads(line)['html'] for line in streamed.content.splitlines()[1:]]
+    assert '\n'.join(chapters) == full.json()['html_content']
+
+
+def test_stream_rejects_bad_zip(client):
+    response = client.post('/api/upload-epub/stream', files={'file': ('book.epub', b'not a zip')})
+    
+    assert response.status_code == 500
+    assert 'EPUB processing failed' in response.json()['detail']
@@ -1,38 +1,70 @@
 // Pure functions for bionic text formatting
 
+// Compiled once at module load instead of once per word
+const WORD_TOKEN_RE = /\S+/g
+const BIONIC_WORD_RE = /^(\W*)(\w+)(\W*)$/
+
+// Where to bold a token: [prefix length, bold length], or null if it isn't a word
+type BoldSplit = [number, number] | null
+
+const getBoldSplit = (token: string, percentage: number): BoldSplit => {
+  const match = BIONIC_WORD_RE.exec(token)
+  if (!match) return null
+  
+  const [, prefix, core] = match
+  const len = core.length
+  let boldCount = 1
+  
+  if (len <= 2) boldCount = 1
+  else if (len <= 5) boldCount = 2
+  else boldCount = Math.max(1, Math.floor(len * percentage))
+  
+  return [prefix.length, boldCount]
+}
+
 export const applyBionicFormatting = (html: string, percentage: number): string => {
     if (!html) return ''
     
     const parser = new DOMParser()
     const doc = parser.parseFromString(html, 'text/html')
     
+    // Books reuse a small vocabulary heavily, so remember each token's split
+    const splitCache = new Map<string, BoldSplit>()
+    
     const processNode = (node: Node) => {
       if (node.nodeType === Node.TEXT_NODE && node.textContent) {
         const text = node.textContent
         if (text.trim()) {
-          const words = text.split(/(\s+)/)
-          const formatted = words.map(word => {
-            if (!word.trim()) return word
-            
-            const match = word.match(/^(\W*)(\w+)(\W*)$/)
-            if (!match) return word
-            
-            const [, prefix, core, suffix] = match
-            const len = core.length
-            let boldCount = 1
+          // Build the <strong> nodes directly rather than reparsing markup per text node
+          const span = doc.createElement('span')
+          
+          // Walk whitespace-delimited tokens in one regex pass, emitting plain text
+          // as slices of the original string between bolded word starts
+          let last = 0
+          let token: RegExpExecArray | null
+          WORD_TOKEN_RE.lastIndex = 0
+          
+          while ((token = WORD_TOKEN_RE.exec(text)) !== null) {
+            let split = splitCache.get(token[0])
+            if (split === undefined) {
+              split = getBoldSplit(token[0], percentage)
+              splitCache.set(token[0], split)
+            }
+            if (!split) continue
             
-            if (len <= 2) boldCount = 1
-            else if (len <= 5) boldCount = 2
-            else boldCount = Math.max(1, Math.floor(len * percentage))
+            const [prefixLength, boldCount] = split
+            const coreStart = token.index + prefixLength
+            if (coreStart > last) span.append(text.slice(last, coreStart))
             
-            const bold = core.slice(0, boldCount)
-            const regular = core.slice(boldCount)
+            const strong = doc.createElement('strong')
+            strong.textContent = text.slice(coreStart, coreStart + boldCount)
+            span.append(strong)
             
-            return `${prefix}<strong>${bold}</strong>${regular}${suffix}`
-          }).join('')
+            last = coreStart + boldCount
+          }
+          
+          if (last < text.length) span.append(text.slice(last))
           
-          const span = doc.createElement('span')
-          span.innerHTML = formatted
           node.parentNode?.replaceChild(span, node)
         }
       } else if (node.nodeType === Node.ELEMENT_NODE) {
@@ -49,6 +81,8 @@ export const applyBionicFormatting = (html: string, percentage: number): string
   
   export const stripBoldTags = (html: string): string => {
     if (!html) return ''
+    // Nothing to strip, so skip parsing the document at all
+    if (!html.includes('<strong')) return html
     
     const parser = new DOMParser()
     const doc = parser.parseFromString(html, 'text/html')
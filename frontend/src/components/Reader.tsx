@@ -1,4 +1,4 @@
-import { useState, useEffect, useRef } from 'react'
+import { useState, useEffect, useRef, useMemo } from 'react'
 import type { ReaderProps, Theme } from './types'
 import ReaderSidebar from './ReaderSidebar'
 import { useKeyboardShortcuts } from './useKeyboardShortcuts'
@@ -91,7 +91,11 @@ const Reader = ({ bookContent, bookTitle, bookAuthor, onNewFile }: ReaderProps)
 
   // ==================== BIONIC FORMATTING ====================
   
-  const displayContent = getFormattedContent(bookContent, bionicEnabled, boldPercentage)
+  // Memoized so scroll-driven re-renders don't reformat the whole book
+  const displayContent = useMemo(
+    () => getFormattedContent(bookContent, bionicEnabled, boldPercentage),
+    [bookContent, bionicEnabled, boldPercentage]
+  )
 
   // ==================== PROGRESS CALCULATION ====================
   